@@ -141,6 +141,15 @@ class AliPCS:
             keepalive_expiry=keepalive_expiry,
             max_retries=connection_max_retries,
         )
+        # The slice uploads are not retried by the adapter, because their streamed bodies
+        # can not be rewound. `upload_file` retries a failed slice from its start.
+        self._upload_session = make_http_session(
+            max_keepalive_connections=max_keepalive_connections,
+            max_connections=max_connections,
+            keepalive_expiry=keepalive_expiry,
+            max_retries=0,
+            pool_block=True,
+        )
 
         self._error_max_retries = error_max_retries
 
@@ -709,8 +718,8 @@ class AliPCS:
         if callback_for_monitor is not None:
             data = MultipartEncoderMonitor(data, callback=lambda monitor: callback_for_monitor(monitor.bytes_read))
 
-        session = requests.Session()
-        session.request(
+        # Reuse the pooled upload session, so slices sent to the same upload host share keep-alive connections
+        self._upload_session.request(
             "PUT",
             url,
             headers=dict(PCS_HEADERS),
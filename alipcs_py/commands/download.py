@@ -21,6 +21,7 @@ from alipcs_py.common.progress_bar import (
     init_progress_bar,
     remove_progress_task,
     reset_progress_task,
+    ProgressUpdater,
 )
 from alipcs_py.commands.sifter import Sifter, sift
 from alipcs_py.commands.log import get_logger
@@ -167,9 +168,7 @@ class Downloader(Enum):
         def done_callback():
             remove_progress_task(task_id)
 
-        def monitor_callback(offset: int):
-            if task_id is not None:
-                _progress.update(task_id, completed=offset)
+        monitor_callback = ProgressUpdater(task_id)
 
         def except_callback(err):
             reset_progress_task(task_id)
@@ -190,6 +189,7 @@ class Downloader(Enum):
             length = len(io)
             _progress.update(task_id, total=length)
             _progress.start_task(task_id)
+            monitor_callback.total = length
 
         meDownloader = MeDownloader(
             io,
@@ -3,7 +3,7 @@ from pathlib import Path
 import os
 
 from alipcs_py.alipcs import AliPCSApi, PcsFile, FromTo
-from alipcs_py.common.path import PathType, join_path
+from alipcs_py.common.path import PathType
 from alipcs_py.common.crypto import calc_sha1
 from alipcs_py.common.constant import CPU_NUM
 from alipcs_py.common.io import EncryptType
@@ -38,22 +38,26 @@ def sync(
         for pcs_file in api.list_iter(remote_pcs_file.file_id, recursive=True, include_dir=False)
     }
 
+    remote_prefix = remotedir.rstrip("/") + "/"
+
     needed_uploads: List[FromTo[PathType, str]] = []
-    needed_checks: List[Tuple[Path, PcsFile]] = []
+    needed_checks: List[Tuple[str, PcsFile]] = []
     all_localpaths = set()
     for root, _, filenames in os.walk(localdir):
+        relative_root = root[len(localdir) + 1 :].replace(os.sep, "/")
         for filename in filenames:
-            localpath = Path(root[len(localdir) + 1 :]) / filename
-            localpath_posix = localpath.as_posix()
+            localpath = os.path.join(root, filename)
+            localpath_posix = relative_root + "/" + filename if relative_root else filename
             all_localpaths.add(localpath_posix)
 
             if localpath_posix not in sub_path_to_its_pcs_file:
-                needed_uploads.append((root / localpath, join_path(remotedir, localpath)))
+                needed_uploads.append((localpath, remote_prefix + localpath_posix))
             else:
-                needed_checks.append((root / localpath, sub_path_to_its_pcs_file[localpath_posix]))
+                needed_checks.append((localpath, sub_path_to_its_pcs_file[localpath_posix]))
 
     for lp, pf in needed_checks:
-        sha1 = calc_sha1(lp.open("rb"))
+        with open(lp, "rb") as fd:
+            sha1 = calc_sha1(fd)
 
         if pf.rapid_upload_info and sha1.lower() != pf.rapid_upload_info.content_hash.lower():
             needed_uploads.append((lp, pf.path))
@@ -1,17 +1,19 @@
-from typing import Any, Callable, Optional, List, Sequence, Tuple, IO, Union
+from typing import Any, Callable, Optional, List, Sequence, Set, Tuple, IO, Union
 import os
+import posixpath
 import time
 import math
 from hashlib import sha1
 from io import BytesIO
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import chain
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
 
 from alipcs_py.alipcs.errors import AliPCSError, RapidUploadError, UploadError
 from alipcs_py.alipcs import AliPCSApi, FromTo
 from alipcs_py.alipcs.pcs import CheckNameMode
 from alipcs_py.common import constant
-from alipcs_py.common.path import PathType, exists, posix_path_basename, posix_path_dirname
+from alipcs_py.common.path import PathType, posix_path_basename, posix_path_dirname
 from alipcs_py.common.event import KeyHandler, KeyboardMonitor
 from alipcs_py.common.constant import CPU_NUM
 from alipcs_py.common.concurrent import retry
@@ -21,9 +23,10 @@ from alipcs_py.common.progress_bar import (
     progress_task_exists,
     remove_progress_task,
     reset_progress_task,
+    ProgressUpdater,
 )
-from alipcs_py.common.crypto import calc_sha1, calc_proof_code
-from alipcs_py.common.io import total_len, EncryptType, reset_encrypt_io
+from alipcs_py.common.crypto import calc_sha1, calc_sha1_with_prefix, calc_proof_code
+from alipcs_py.common.io import total_len, HashedChunkIO, EncryptType, reset_encrypt_io
 from alipcs_py.commands.log import get_logger
 
 from rich.progress import TaskID
@@ -36,6 +39,10 @@ logger = get_logger(__name__)
 # If slice size >= 100M, the rate of uploading will be much lower.
 DEFAULT_SLICE_SIZE = 80 * constant.OneM
 
+# Files smaller than this size are uploaded directly without trying rapid upload,
+# which costs a request to the server and is rarely hit by small files.
+RAPID_UPLOAD_MIN_SIZE = 4 * constant.OneM
+
 UPLOAD_STOP = False
 
 
@@ -73,26 +80,39 @@ def adjust_slice_size(slice_size: int, io_len: int) -> int:
 def from_tos(localpaths: Sequence[PathType], remotedir: str) -> List[FromTo]:
     """Recursively find all localpaths and their corresponded remotepath"""
 
-    ft: List[FromTo[Path, str]] = []
+    remote_prefix = remotedir.rstrip("/") + "/" if remotedir else ""
+
+    ft: List[FromTo[str, str]] = []
     for localpath in localpaths:
-        localpath = Path(localpath).resolve()
-        if not localpath.exists():
+        localpath = os.path.realpath(localpath)
+        if not os.path.exists(localpath):
             continue
 
-        if localpath.is_file():
-            remotepath = Path(remotedir, localpath.name).as_posix()
+        if os.path.isfile(localpath):
+            remotepath = remote_prefix + os.path.basename(localpath)
             ft.append((localpath, remotepath))
         else:
-            parent_num = len(localpath.parent.parts)
+            # Keep the name of `localpath` as the top directory of the remote paths
+            parent_len = len(os.path.dirname(localpath).rstrip(os.sep)) + 1
             for root, _, filenames in os.walk(localpath):
+                relative_root = root[parent_len:].replace(os.sep, "/")
                 for filename in filenames:
-                    sub_path = Path(root, filename)
-                    relative_path = Path(*Path(root).parts[parent_num:], filename).as_posix()
-                    remotepath = Path(remotedir, relative_path).as_posix()
+                    sub_path = os.path.join(root, filename)
+                    # `relative_root` is empty when `localpath` is the root directory
+                    remotepath = posixpath.join(remote_prefix, relative_root, filename)
                     ft.append((sub_path, remotepath))
     return ft
 
 
+def _upload_file_except_callback(err: Exception, fail_count: int):
+    logger.warning(
+        "`upload_file`: fails: error: %s, fail_count: %s",
+        err,
+        fail_count,
+        exc_info=err,
+    )
+
+
 def upload(
     api: AliPCSApi,
     from_to_list: List[FromTo[PathType, str]],
@@ -154,20 +174,19 @@ def upload(
         len(from_to_list),
     )
 
-    futures = []
+    retry_upload_file = retry(max_retries, except_callback=_upload_file_except_callback)(upload_file)
+
+    # Keep at most `max_workers` files in flight. The finished futures are kept, so
+    # all files are uploaded before the first failure is raised.
+    futures: Set[Future] = set()
+    finished: List[Future] = []
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
         for idx, from_to in enumerate(from_to_list):
             logger.debug("`upload_many`: Upload: index: %s", idx)
 
-            retry_upload_file = retry(
-                max_retries,
-                except_callback=lambda err, fail_count: logger.warning(
-                    "`upload_file`: fails: error: %s, fail_count: %s",
-                    err,
-                    fail_count,
-                    exc_info=err,
-                ),
-            )(upload_file)
+            if len(futures) >= max_workers:
+                done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                finished.extend(done)
 
             fut = executor.submit(
                 retry_upload_file,
@@ -180,10 +199,10 @@ def upload(
                 only_use_rapid_upload=only_use_rapid_upload,
                 show_progress=show_progress,
             )
-            futures.append(fut)
+            futures.add(fut)
 
     # Wait for all futures done
-    for fut in as_completed(futures):
+    for fut in chain(finished, as_completed(futures)):
         # Raise the exception if the result of the future is an exception
         fut.result()
 
@@ -206,12 +225,12 @@ def _init_encrypt_io(
     encrypt_password: bytes = b"",
     encrypt_type: EncryptType = EncryptType.No,
 ) -> Tuple[IO, int, int, int]:
-    assert exists(Path(localpath)), f"`{localpath}` does not exist"
-
-    stat = Path(localpath).stat()
+    # `os.stat` raises `FileNotFoundError` if `localpath` does not exist
+    stat = os.stat(localpath)
     local_ctime, local_mtime = int(stat.st_ctime), int(stat.st_mtime)
 
-    encrypt_io = encrypt_type.encrypt_io(open(localpath, "rb"), encrypt_password)
+    fd = os.open(localpath, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    encrypt_io = encrypt_type.encrypt_io(os.fdopen(fd, "rb"), encrypt_password)
     # IO Length
     encrypt_io_len = total_len(encrypt_io)
 
@@ -360,13 +379,13 @@ def upload_file(
         _progress.start_task(task_id)
 
     slice_completed = 0
+    progress_updater = ProgressUpdater(task_id, total=encrypt_io_len)
 
     def callback_for_slice(offset: int):
         if callback_for_monitor is not None:
             callback_for_monitor(slice_completed + offset)
         else:
-            if task_id is not None and progress_task_exists(task_id):
-                _progress.update(task_id, completed=slice_completed + offset)
+            progress_updater(slice_completed + offset)
 
     def teardown():
         encrypt_io.close()
@@ -377,9 +396,11 @@ def upload_file(
         slice1k_hash = ""
         content_hash = ""
         pcs_prepared_file = None
-        if encrypt_type == EncryptType.No and encrypt_io_len >= 1 * constant.OneK:
+        rapid_upload_min_size = 1 * constant.OneK if only_use_rapid_upload else RAPID_UPLOAD_MIN_SIZE
+        if encrypt_type == EncryptType.No and encrypt_io_len >= rapid_upload_min_size:
+            # Keep the position of `encrypt_io` after the first 1K bytes, so the content hash
+            # can continue from there instead of re-reading the file from the start.
             slice1k_bytes = encrypt_io.read(constant.OneK)
-            reset_encrypt_io(encrypt_io)
             slice1k_hash = calc_sha1(slice1k_bytes)
 
             pcs_prepared_file = api.prepare_file(
@@ -391,7 +412,7 @@ def upload_file(
                 check_name_mode=check_name_mode,
             )
             if pcs_prepared_file.can_rapid_upload():
-                content_hash = calc_sha1(encrypt_io)
+                content_hash = calc_sha1_with_prefix(encrypt_io, slice1k_bytes)
                 proof_code = calc_proof_code(encrypt_io, encrypt_io_len, api.access_token)
 
                 # Rapid upload
@@ -457,12 +478,17 @@ def upload_file(
             if size == 0:
                 break
 
-            data = encrypt_io.read(size)
-            hasher.update(data)
-
-            io = BytesIO(data)
+            io: IO
+            if encrypt_type == EncryptType.No:
+                # Upload the slice directly from the local file instead of holding
+                # the whole slice in memory. The slice is hashed while it is uploaded.
+                io = HashedChunkIO(encrypt_io, size, hasher)
+            else:
+                data = encrypt_io.read(size)
+                hasher.update(data)
+                io = BytesIO(data)
 
-            logger.debug("`upload_file`: upload_slice: size should be %s == %s", size, len(data))
+            logger.debug("`upload_file`: upload_slice: size should be %s == %s", size, total_len(io))
 
             fail_count = 0
             while True:  # Retry upload until success
@@ -492,6 +518,8 @@ def upload_file(
                     pcs_prepared_file.part_info_list = new_pcs_prepared_file.part_info_list
                     upload_urls = new_pcs_prepared_file.upload_urls()
 
+            # Move `encrypt_io` to the start of the next slice
+            io.seek(0, 2)
             slice_completed += size
 
         local_file_hash = hasher.hexdigest()
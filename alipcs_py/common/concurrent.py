@@ -1,28 +1,19 @@
 from typing import Optional, Callable, Any
 from functools import wraps
-from threading import Semaphore
-
-
-def sure_release(semaphore: Semaphore, func, *args, **kwargs):
-    """Release semaphore after func is done."""
-
-    try:
-        return func(*args, **kwargs)
-    finally:
-        semaphore.release()
+from itertools import count
 
 
 def retry(times: int, except_callback: Optional[Callable[[Exception, int], Any]] = None):
-    """Retry times when func fails"""
+    """Retry times when func fails
+
+    If `times` is negative, retry forever.
+    """
 
     def wrap(func):
         @wraps(func)
         def retry_it(*args, **kwargs):
-            nonlocal times
-            if times < 0:  # forever
-                times = 1 << 32
-
-            for i in range(1, times + 1):
+            counter = count(1) if times < 0 else range(1, times + 1)
+            for i in counter:
                 try:
                     r = func(*args, **kwargs)
                     return r
@@ -1,51 +1,41 @@
-from typing import Union, List, Tuple, IO, Callable, Any, cast
-import re
+from typing import Optional, Union, List, Tuple, IO, Callable, Any, cast
 import os
-import subprocess
 import random
 from io import BufferedReader
+from functools import lru_cache
 from abc import ABC, abstractmethod
 from zlib import crc32
 import hashlib
 from hashlib import md5, sha1
 import base64
 
-from passlib.crypto.digest import pbkdf1
-
 import ecdsa
 from ecdsa import SigningKey, VerifyingKey
 
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers import Cipher, CipherContext, algorithms, modes
 from cryptography.hazmat.primitives.padding import PKCS7
 from cryptography.hazmat.backends import default_backend
 
 from alipcs_py.common import constant
-from alipcs_py.common.platform import IS_LINUX, IS_MACOS
 from alipcs_py.common.simple_cipher import SimpleCryptography as _SimpleCryptography
 
 
-def _md5_cmd(localpath: str) -> List[str]:
-    if IS_MACOS:
-        cmd = ["md5", localpath]
-    elif IS_LINUX:
-        cmd = ["md5sum", localpath]
-    else:  # windows
-        cmd = ["CertUtil", "-hashfile", localpath, "MD5"]
-    return cmd
-
-
 def calc_file_md5(localpath: str) -> str:
-    cp = subprocess.run(_md5_cmd(localpath), universal_newlines=True, stdout=subprocess.PIPE)
+    """Calculate the md5 of the file at `localpath`
 
-    output = cp.stdout.strip()
-    if IS_MACOS:
-        return re.split(r"\s+", output)[-1]
-    elif IS_LINUX:
-        return re.split(r"\s+", output)[0]
-    else:  # windows
-        cn = output.split("CertUtil")[0].strip()
-        cn = cn.split(":")[-1].strip().replace(" ", "")
-        return cn
+    The file is read into one reused buffer, so no new bytes are allocated per chunk.
+    """
+
+    hasher = md5()
+    buf = bytearray(constant.OneM)
+    view = memoryview(buf)
+    with open(localpath, "rb", buffering=0) as fd:
+        while True:
+            size = fd.readinto(buf)
+            if not size:
+                break
+            hasher.update(view[:size])
+    return hasher.hexdigest()
 
 
 ReadableBuffer = Union[bytes, bytearray]  # stable
@@ -54,14 +44,25 @@ ReadableBuffer = Union[bytes, bytearray]  # stable
 def calc_crc32_and_md5(stream: IO, chunk_size: int) -> Tuple[int, str]:
     md5_v = md5()
     crc32_v = 0
-    while True:
-        buf = stream.read(chunk_size)
-        if buf:
-            md5_v.update(buf)
-            crc32_v = crc32(buf, crc32_v).conjugate()
-        else:
-            break
-    return crc32_v.conjugate() & 0xFFFFFFFF, md5_v.hexdigest()
+    if hasattr(stream, "readinto"):
+        # Read into one reused buffer and feed the same view to both hashes
+        buf = bytearray(chunk_size)
+        view = memoryview(buf)
+        while True:
+            size = stream.readinto(buf)
+            if not size:
+                break
+            chunk = view[:size]
+            md5_v.update(chunk)
+            crc32_v = crc32(chunk, crc32_v)
+    else:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            md5_v.update(chunk)
+            crc32_v = crc32(chunk, crc32_v)
+    return crc32_v & 0xFFFFFFFF, md5_v.hexdigest()
 
 
 def calc_hash(hash_method: Callable, buf: Union[str, bytes, IO, BufferedReader], encoding="utf-8") -> str:
@@ -89,12 +90,38 @@ def calc_sha1(buf: Union[str, bytes, IO, BufferedReader], encoding="utf-8") -> s
     return calc_hash(sha1, buf, encoding=encoding)
 
 
+def calc_sha1_with_prefix(io: IO, prefix: bytes) -> str:
+    """Calculate the sha1 of `prefix` followed by the remaining content of `io`
+
+    `prefix` is the content which has already been read from the start of `io`,
+    so it does not need to be read again.
+    """
+
+    hasher = sha1(prefix)
+    while True:
+        chunk = io.read(constant.OneM)
+        if not chunk:
+            return hasher.hexdigest()
+        hasher.update(chunk)
+
+
+@lru_cache(maxsize=4)
+def _proof_key_from_token(key: str) -> int:
+    """The offset seed of the proof code derived from `key` (the access token)
+
+    The access token is stable for a session, so the derivation only runs once
+    for all files uploaded with the same token.
+    """
+
+    # The first 8 bytes of the md5 digest as a big-endian integer
+    return int.from_bytes(md5(key.encode("utf-8")).digest()[:8], "big")
+
+
 def calc_proof_code(io: IO, io_len: int, key: str) -> str:
     if io_len == 0:
         return ""
 
-    key_md5 = calc_md5(key)
-    offset = int("0x" + key_md5[:16], 16) % io_len
+    offset = _proof_key_from_token(key) % io_len
     pre_offset = io.tell()
     io.seek(offset, 0)
     buf = io.read(8) or b""
@@ -106,18 +133,16 @@ U8_LIST = list(range(1 << 8))
 
 
 def random_bytes(size: int, seed: Any = None) -> bytes:
-    """Generate random bytes"""
+    """Generate random bytes
+
+    The result for a given `seed` derives the iv of the encrypted head and the nonces
+    of encrypted files, so the algorithm must not change.
+    """
 
     rg = random.Random(seed)
     return bytes(rg.sample(U8_LIST, size))
 
 
-def random_sys_bytes(size: int) -> bytes:
-    """Generate random bytes with `os.urandom`"""
-
-    return os.urandom(size)
-
-
 def padding_key(key: Union[str, bytes], length: int = 0, value: bytes = b"\xff") -> bytes:
     """padding key with `value`"""
 
@@ -132,7 +157,7 @@ def padding_key(key: Union[str, bytes], length: int = 0, value: bytes = b"\xff")
     if value:
         pad_bytes = value * (pad_len)
     else:
-        pad_bytes = random_sys_bytes(pad_len)
+        pad_bytes = os.urandom(pad_len)
     return key + pad_bytes
 
 
@@ -171,33 +196,34 @@ def pkcs7_unpadding(data: bytes, block_size):
 
 
 def generate_salt(size: int = 8) -> bytes:
-    return random_sys_bytes(size)
+    return os.urandom(size)
 
 
 # Generate key and iv with password and salt
 # https://security.stackexchange.com/a/117654
 # {{{
+_KEY_IV_HASHES = {
+    "md5": hashlib.md5,
+    "sha256": hashlib.sha256,
+    "sha512": hashlib.sha512,
+}
+
+
 def generate_key_iv(
     password: bytes, salt: bytes, key_size: int, iv_size: int, algo: str = "md5"
 ) -> Tuple[bytes, bytes]:
-    def hasher(algo: str, data: bytes) -> bytes:
-        hashes = {
-            "md5": hashlib.md5,
-            "sha256": hashlib.sha256,
-            "sha512": hashlib.sha512,
-        }
-        h = hashes[algo]()
-        h.update(data)
-        return h.digest()
-
-    if algo == "md5":
-        temp = pbkdf1("md5", password, salt, 1, 16)
-    else:
-        temp = b""
+    """The `EVP_BytesToKey` of OpenSSL with one iteration
+
+    D_1 = hash(password + salt), D_i = hash(D_(i-1) + password + salt)
+    """
+
+    hash_method = _KEY_IV_HASHES[algo]
+    data = password + salt
 
-    fd = temp
+    temp = b""
+    fd = b""
     while len(fd) < key_size + iv_size:
-        temp = hasher(algo, temp + password + salt)
+        temp = hash_method(temp + data).digest()
         fd += temp
 
     key = fd[0:key_size]
@@ -240,11 +266,16 @@ class SimpleCryptography(Cryptography):
         self._c = _SimpleCryptography(key)
         self._key = key
 
+        # The 256-byte maps are translation tables, so `bytes.translate` maps
+        # all bytes in one call without copying the data first.
+        self._encrypt_table = self._c._encrypt_byte_map
+        self._decrypt_table = self._c._decrypt_byte_map
+
     def encrypt(self, data: bytes) -> bytes:
-        return self._c.encrypt(data)
+        return bytes(data).translate(self._encrypt_table)
 
     def decrypt(self, data: bytes) -> bytes:
-        return self._c.decrypt(data)
+        return bytes(data).translate(self._decrypt_table)
 
     def reset(self):
         pass
@@ -267,6 +298,11 @@ class ChaCha20Cryptography(Cryptography):
 
         self._key = key
         self._nonce = nonce
+        self._cipher = Cipher(
+            algorithms.ChaCha20(self._key, self._nonce),
+            mode=None,
+            backend=default_backend(),
+        )
         self.reset()
 
     def encrypt(self, data: bytes) -> bytes:
@@ -276,13 +312,8 @@ class ChaCha20Cryptography(Cryptography):
         return self._decryptor.update(data)
 
     def reset(self):
-        cipher = Cipher(
-            algorithms.ChaCha20(self._key, self._nonce),
-            mode=None,
-            backend=default_backend(),
-        )
-        self._encryptor = cipher.encryptor()
-        self._decryptor = cipher.decryptor()
+        self._encryptor = self._cipher.encryptor()
+        self._decryptor = self._cipher.decryptor()
 
     def finalize(self):
         self._encryptor.finalize()
@@ -297,8 +328,23 @@ class AES256CBCCryptography(Cryptography):
         self._key = key
         self._iv = iv
         self._mode = modes.CBC(iv)
+        # The cipher is stateless, contexts created from it start from the iv
+        self._cipher = Cipher(algorithms.AES(self._key), mode=self._mode)
         self.reset()
 
+    @property
+    def _encryptor(self):
+        # Only create the context of the used direction
+        if self._encryptor_ctx is None:
+            self._encryptor_ctx = self._cipher.encryptor()
+        return self._encryptor_ctx
+
+    @property
+    def _decryptor(self):
+        if self._decryptor_ctx is None:
+            self._decryptor_ctx = self._cipher.decryptor()
+        return self._decryptor_ctx
+
     def encrypt(self, data: bytes) -> bytes:
         assert len(data) % 16 == 0
         return self._encryptor.update(data)
@@ -307,13 +353,14 @@ class AES256CBCCryptography(Cryptography):
         return self._decryptor.update(data)
 
     def reset(self):
-        cipher = Cipher(algorithms.AES(self._key), mode=self._mode)
-        self._encryptor = cipher.encryptor()
-        self._decryptor = cipher.decryptor()
+        self._encryptor_ctx: Optional[CipherContext] = None
+        self._decryptor_ctx: Optional[CipherContext] = None
 
     def finalize(self):
-        self._encryptor.finalize()
-        self._decryptor.finalize()
+        if self._encryptor_ctx is not None:
+            self._encryptor_ctx.finalize()
+        if self._decryptor_ctx is not None:
+            self._decryptor_ctx.finalize()
 
 
 def aes256cbc_encrypt(data: bytes, key: bytes, iv: bytes):
@@ -1,6 +1,6 @@
 import time
+from functools import lru_cache
 from datetime import datetime, timezone
-from dateutil import parser
 
 
 def now_timestamp() -> int:
@@ -9,6 +9,8 @@ def now_timestamp() -> int:
     return int(time.time())
 
 
+# Files listed in a directory often share the same created or updated time
+@lru_cache(maxsize=4096)
 def iso_8601_to_timestamp(date_string: str) -> int:
     """Convert ISO 8601 datetime string to the timestamp (integer)
 
@@ -17,7 +19,18 @@ def iso_8601_to_timestamp(date_string: str) -> int:
             e.g. "2021-06-22T07:16:03Z" or "2021-06-22T07:16:03.032Z"
     """
 
-    date_obj = parser.parse(date_string)
+    # `datetime.fromisoformat` of Python < 3.11 does not accept the "Z" suffix
+    # and only accepts 3 or 6 digits of fractional seconds, which are dropped
+    # as the timestamp is in seconds.
+    date_string = date_string.replace("Z", "+00:00")
+    head, dot, tail = date_string.partition(".")
+    if dot:
+        i = 0
+        while i < len(tail) and tail[i].isdigit():
+            i += 1
+        date_string = head + tail[i:]
+
+    date_obj = datetime.fromisoformat(date_string)
     return int(date_obj.timestamp())
 
 
@@ -1,6 +1,7 @@
 from typing import Optional, Any, Callable
 from pathlib import Path
 
+from alipcs_py.common import constant
 from alipcs_py.common.io import RangeRequestIO
 from alipcs_py.common.concurrent import retry
 from alipcs_py.common.path import PathType
@@ -8,6 +9,8 @@ from alipcs_py.common.path import PathType
 
 DEFAULT_MAX_WORKERS = 5
 
+WRITE_BUFFER_SIZE = constant.OneM
+
 
 class MeDownloader:
     """Download the content from `range_request_io` to `localpath`"""
@@ -29,18 +32,20 @@ class MeDownloader:
         self.except_callback = except_callback
 
     def _init_fd(self):
+        # The chunks from `range_request_io` are small, a large write buffer merges
+        # them into one `write` syscall per `WRITE_BUFFER_SIZE` bytes.
         if self.continue_:
             path = Path(self.localpath)
             if self.range_request_io.seekable():
                 offset = path.stat().st_size if path.exists() else 0
-                fd = path.open("ab")
+                fd = path.open("ab", buffering=WRITE_BUFFER_SIZE)
                 fd.seek(offset, 0)
             else:
                 offset = 0
-                fd = path.open("wb")
+                fd = path.open("wb", buffering=WRITE_BUFFER_SIZE)
         else:
             offset = 0
-            fd = open(self.localpath, "wb")
+            fd = open(self.localpath, "wb", buffering=WRITE_BUFFER_SIZE)
 
         self.offset = offset
         self.fd = fd
@@ -65,13 +70,18 @@ class MeDownloader:
 
             self.range_request_io.seek(self.offset)
 
-            for buf in self.range_request_io.read_iter():
-                self.fd.write(buf)
-                self.offset += len(buf)
-
-            if self.done_callback:
-                self.done_callback()
-
-            self.fd.close()
+            offset = self.offset
+            write = self.fd.write
+            try:
+                for buf in self.range_request_io.read_iter():
+                    write(buf)
+                    offset += len(buf)
+
+                if self.done_callback:
+                    self.done_callback()
+            finally:
+                self.offset = offset
+                # Flush the buffered content before retrying, which reopens the file
+                self.fd.close()
 
         _download()
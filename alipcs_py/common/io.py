@@ -23,7 +23,6 @@ from alipcs_py.common import constant
 from alipcs_py.common.number import u64_to_u8x8, u8x8_to_u64
 from alipcs_py.common.crypto import (
     random_bytes,
-    random_sys_bytes,
     Cryptography,
     SimpleCryptography,
     ChaCha20Cryptography,
@@ -147,6 +146,26 @@ class ChunkIO(IO):
         pass
 
 
+class HashedChunkIO(ChunkIO):
+    """A `ChunkIO` which feeds the bytes read to `hasher`
+
+    Each byte is fed once, so the bytes read again after seeking back are not fed twice.
+    """
+
+    def __init__(self, io: IO, size: int, hasher: Any):
+        super().__init__(io, size)
+        self._hasher = hasher
+        self._hashed = 0
+
+    def read(self, size: int = -1) -> Optional[bytes]:
+        offset = self._offset
+        data = super().read(size)
+        if data and self._offset > self._hashed:
+            self._hasher.update(data[self._hashed - offset :])
+            self._hashed = self._offset
+        return data
+
+
 def sample_data(io: IO, rg: Random, size: int) -> bytes:
     """Sample data with size"""
 
@@ -174,7 +193,7 @@ def rapid_upload_params(io: IO) -> Tuple[str, str, int, int]:
     io_len += len(t)
     md5_v.update(t)
     buf += t
-    crc32_v = crc32(buf, crc32_v).conjugate()
+    crc32_v = crc32(buf, crc32_v)
 
     # content_crc32, content_md5 = calc_crc32_and_md5(io, constant.OneM)
 
@@ -182,12 +201,12 @@ def rapid_upload_params(io: IO) -> Tuple[str, str, int, int]:
         buf = io.read(chunk_size)
         if buf:
             md5_v.update(buf)
-            crc32_v = crc32(buf, crc32_v).conjugate()
+            crc32_v = crc32(buf, crc32_v)
             io_len += len(buf)
         else:
             break
 
-    content_crc32, content_md5 = crc32_v.conjugate() & 0xFFFFFFFF, md5_v.hexdigest()
+    content_crc32, content_md5 = crc32_v & 0xFFFFFFFF, md5_v.hexdigest()
 
     # if isinstance(io, EncryptIO):
     #     io_len = len(io)
@@ -299,7 +318,7 @@ class EncryptIO(IO):
             BAIDUPCS_PY_CRYPTO_MAGIC_CODE
             + self.magic_code()
             + self._salt
-            + random_sys_bytes(8)
+            + os.urandom(8)
             + u64_to_u8x8(self._total_origin_len),
             PADDED_ENCRYPT_HEAD_LEN,
             value=b"",
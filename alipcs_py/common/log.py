@@ -1,6 +1,7 @@
 from typing import Optional
 from pathlib import Path
 from os import PathLike
+import os
 import logging
 from logging import Logger
 
@@ -20,21 +21,29 @@ def get_logger(
     filename: Optional[PathLike] = None,
     level: TLogLevel = DEFAULT_LOG_LEVEL,
 ) -> Logger:
+    """Get the logger with a stream handler and an optional file handler
+
+    Getting the same logger again does not add the handlers it already has.
+    """
+
     logger = logging.getLogger(name)
     logger.setLevel(level)
 
-    stream_handler = logging.StreamHandler()  # stdout
-    stream_handler.setFormatter(logging.Formatter(fmt))
-    logger.addHandler(stream_handler)
+    file_handlers = [h for h in logger.handlers if isinstance(h, logging.FileHandler)]
+    if not any(isinstance(h, logging.StreamHandler) and h not in file_handlers for h in logger.handlers):
+        stream_handler = logging.StreamHandler()  # stdout
+        stream_handler.setFormatter(logging.Formatter(fmt))
+        logger.addHandler(stream_handler)
 
     if filename:
         filename = Path(filename)
-        _dir = filename.parent
-        if not _dir.exists():
-            _dir.mkdir(parents=True, exist_ok=True)
-
-        file_handler = logging.FileHandler(filename)
-        file_handler.setFormatter(logging.Formatter(fmt))
-        logger.addHandler(file_handler)
+        if not any(h.baseFilename == os.path.abspath(filename) for h in file_handlers):
+            _dir = filename.parent
+            if not _dir.exists():
+                _dir.mkdir(parents=True, exist_ok=True)
+
+            file_handler = logging.FileHandler(filename)
+            file_handler.setFormatter(logging.Formatter(fmt))
+            logger.addHandler(file_handler)
 
     return logger
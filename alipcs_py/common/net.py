@@ -1,4 +1,5 @@
 import socket
+from functools import lru_cache
 
 import requests
 import requests.adapters
@@ -25,20 +26,39 @@ def random_avail_port() -> int:
         return port
 
 
+@lru_cache(maxsize=8)
+def _make_http_adapter(
+    max_keepalive_connections: int, max_connections: int, max_retries: int, pool_block: bool
+) -> requests.adapters.HTTPAdapter:
+    """The http adapter shared by the sessions made with the same arguments"""
+
+    return requests.adapters.HTTPAdapter(
+        pool_connections=max_keepalive_connections,
+        pool_maxsize=max_connections,
+        max_retries=max_retries,
+        pool_block=pool_block,
+    )
+
+
 def make_http_session(
     max_keepalive_connections: int = 50,
     max_connections: int = 50,
     keepalive_expiry: float = 10 * 60,
     max_retries: int = 2,
+    pool_block: bool = False,
 ) -> requests.Session:
-    """Make a http session with keepalive connections, maximum connections and retries"""
+    """Make a http session with keepalive connections, maximum connections and retries
+
+    If `pool_block` is True, a request waits for a free connection when the pool is full
+    instead of opening a connection which is discarded after the request.
+
+    The sessions made with the same arguments share one adapter, so that they reuse
+    the pooled connections instead of doing new TLS handshakes. Each session has
+    its own cookies.
+    """
 
     session = requests.Session()
-    adapter = requests.adapters.HTTPAdapter(
-        pool_connections=max_keepalive_connections,
-        pool_maxsize=max_connections,
-        max_retries=max_retries,
-    )
+    adapter = _make_http_adapter(max_keepalive_connections, max_connections, max_retries, pool_block)
     session.mount("http://", adapter)
     session.mount("https://", adapter)
     return session
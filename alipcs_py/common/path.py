@@ -1,5 +1,7 @@
 from typing import Tuple, Union
-from pathlib import Path, PurePosixPath
+import os
+import posixpath
+from pathlib import Path
 from os import PathLike
 
 from alipcs_py.common.platform import IS_WIN
@@ -22,41 +24,57 @@ def is_dir(localpath: PathType) -> bool:
     return localpath.is_dir()
 
 
+def _to_posix_str(path: PathType) -> str:
+    path = os.fspath(path)
+    if IS_WIN:
+        path = path.replace("\\", "/")
+    return path
+
+
 # TODO: Change function name to `join_path_as_posix`
 def join_path(parent: PathType, *children: PathType) -> str:
-    """Join posix paths"""
+    """Join posix paths
 
-    _path = Path(parent)
-    for child in children:
-        _path = _path / child
+    The joined path is normalized with string operations only, no filesystem access.
+    """
 
-    path = _path.as_posix()
+    path = posixpath.join(_to_posix_str(parent), *[_to_posix_str(child) for child in children])
     has_root = path.startswith("/")
-    if not has_root:
-        path = "/" + path
 
-    path = Path(path).resolve().as_posix()
+    # Normalize as an absolute path, so that ".." can not go beyond the root
+    path = posixpath.normpath("/" + path.lstrip("/"))
 
-    if IS_WIN:
-        p = path.split(":", 1)[-1]
-        if not has_root:
-            return p[1:]
-        else:
-            return p
+    if not has_root:
+        return path[1:]
     else:
-        if not has_root:
-            return path[1:]
-        else:
-            return path
+        return path
 
 
 def split_posix_path(path: PathType) -> Tuple[str, ...]:
-    return PurePosixPath(path).parts
+    """The same as `PurePosixPath(path).parts`, but only with string operations"""
+
+    path = os.fspath(path)
+    parts = tuple(name for name in path.split("/") if name and name != ".")
+    if path.startswith("/"):
+        # POSIX keeps exactly two leading slashes as the root
+        root = "//" if path.startswith("//") and not path.startswith("///") else "/"
+        return (root,) + parts
+    return parts
 
 
 def posix_path_basename(path: PathType) -> str:
-    return PurePosixPath(path).name
+    """The same as `PurePosixPath(path).name`"""
+
+    parts = split_posix_path(path)
+    if not parts or parts[-1].startswith("/"):
+        return ""
+    return parts[-1]
 
 
 def posix_path_dirname(path: PathType) -> str:
-    return PurePosixPath(path).parent.as_posix()
+    """The same as `PurePosixPath(path).parent.as_posix()`"""
+
+    parts = split_posix_path(path)
+    if parts and parts[0].startswith("/"):
+        return parts[0] + "/".join(parts[1:-1])
+    return "/".join(parts[:-1]) or "."
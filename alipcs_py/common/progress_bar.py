@@ -12,6 +12,8 @@ from rich.progress import (
 )
 from rich.table import Column
 
+from alipcs_py.common import constant
+
 _progress = Progress(
     SpinnerColumn(),
     TextColumn("[bold blue]{task.fields[title]}", justify="right", table_column=Column(overflow="fold")),
@@ -50,3 +52,36 @@ def remove_progress_task(task_id: Optional[TaskID]):
 def reset_progress_task(task_id: Optional[TaskID]):
     if task_id is not None and progress_task_exists(task_id):
         _progress.reset(task_id)
+
+
+# The least bytes between two updates of a task's completed
+PROGRESS_UPDATE_STEP = constant.OneM
+
+
+class ProgressUpdater:
+    """Update the completed of the progress task at most once per `step` bytes
+
+    `_progress` is redrawn by its own refresh thread, so updating it for every
+    transferred chunk only contends its lock. The completed is always updated
+    when it reaches `total`, so the task does not stop short of its end.
+    """
+
+    def __init__(self, task_id: Optional[TaskID], total: Optional[int] = None, step: int = PROGRESS_UPDATE_STEP):
+        self.task_id = task_id
+        self.total = total
+        self.step = step
+        self.last_completed = 0
+
+    def __call__(self, completed: int):
+        if self.task_id is None:
+            return
+
+        # Always update when the completed goes back, e.g. retrying
+        if (
+            completed < self.last_completed
+            or completed - self.last_completed >= self.step
+            or (self.total is not None and completed >= self.total > self.last_completed)
+        ):
+            self.last_completed = completed
+            if progress_task_exists(self.task_id):
+                _progress.update(self.task_id, completed=completed)
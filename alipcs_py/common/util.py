@@ -7,10 +7,13 @@ def json_dumps(obj: Any) -> str:
 
 
 def json_dump_values(obj: Dict[str, Any]) -> Dict[str, str]:
-    """Convert dict's values which are list or dict as json string"""
+    """Convert dict's values which are list or dict as json string
 
-    new_obj = dict(obj)
-    for k, v in new_obj.items():
-        if isinstance(v, (dict, list)):
-            new_obj[k] = json.dumps(v)
-    return new_obj
+    The `obj` is returned as is if no value needs converting.
+    The default separators of `json.dumps` are kept, since `get_or_create`
+    matches the stored values with the converted ones.
+    """
+
+    if not any(isinstance(v, (dict, list)) for v in obj.values()):
+        return obj
+    return {k: json.dumps(v) if isinstance(v, (dict, list)) else v for k, v in obj.items()}
@@ -8,10 +8,11 @@ import toml  # type: ignore
 
 def _to_buildin(obj: Any) -> Any:
     if isinstance(obj, SimpleNamespace):
-        data = dict(obj.__dict__)
+        data = {k: _to_buildin(v) for k, v in vars(obj).items()}
+        # Annotated fields only in the class take their defaults
         for field in getattr(obj, "__annotations__", {}):
-            val = getattr(obj, field)
-            data[field] = _to_buildin(val)
+            if field not in data:
+                data[field] = _to_buildin(getattr(obj, field))
         return data
     elif isinstance(obj, list):
         return [_to_buildin(item) for item in obj]
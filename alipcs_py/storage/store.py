@@ -1,10 +1,10 @@
 from typing import Optional, Tuple, List, Any
 
-from peewee import SQL
+from peewee import SQL, chunked
 
 from alipcs_py.alipcs.api import AliPCSApiMix
 from alipcs_py.alipcs.inner import PcsSharedLinkInfo, PcsFile
-from alipcs_py.storage.tables import PcsSharedLinkInfoTable, PcsFileTable
+from alipcs_py.storage.tables import PcsSharedLinkInfoTable, PcsFileTable, SQLITE_MAX_VARIABLE_NUMBER
 
 
 class SharedStore:
@@ -24,18 +24,35 @@ class SharedStore:
         )
         return pcs_shared_link_info_ins
 
-    def add_shared_file(self, share_id: str, pcs_file: PcsFile) -> Any:
-        if PcsFileTable.get_or_none(file_id=pcs_file.file_id):
-            # The file exists
+    def add_shared_file(self, share_id: str, pcs_file: PcsFile) -> None:
+        self.add_shared_files(share_id, [pcs_file])
+
+    def add_shared_files(self, share_id: str, pcs_files: List[PcsFile]) -> None:
+        """Add the shared files which are not stored in one transaction"""
+
+        if not pcs_files:
             return
 
-        pcs_shared_link_info_ins = PcsSharedLinkInfoTable.get_or_none(share_id=share_id)
+        file_ids = list({pcs_file.file_id for pcs_file in pcs_files})
+        with PcsFileTable._meta.database.atomic():  # type: ignore
+            exist_file_ids = set()
+            for ids in chunked(file_ids, SQLITE_MAX_VARIABLE_NUMBER):
+                query = PcsFileTable.select(PcsFileTable.file_id).where(PcsFileTable.file_id.in_(ids))
+                exist_file_ids.update(item.file_id for item in query)
 
-        pcs_file_ins, _ = PcsFileTable.get_or_create(
-            **{k: getattr(pcs_file, k) for k in pcs_file.__dataclass_fields__},
-            shared_link_info_id=pcs_shared_link_info_ins.id,
-        )
-        return pcs_file_ins
+            rows = []
+            for pcs_file in pcs_files:
+                if pcs_file.file_id in exist_file_ids:
+                    continue
+                exist_file_ids.add(pcs_file.file_id)
+                rows.append({k: getattr(pcs_file, k) for k in pcs_file.__dataclass_fields__})
+            if not rows:
+                return
+
+            pcs_shared_link_info_ins = PcsSharedLinkInfoTable.get_or_none(share_id=share_id)
+            for row in rows:
+                row["shared_link_info_id"] = pcs_shared_link_info_ins.id
+            PcsFileTable.insert_rows(rows)
 
     def delete_shared_links(self, *share_ids: str) -> None:
         PcsSharedLinkInfoTable.delete().where(PcsSharedLinkInfoTable.share_id.in_(share_ids)).execute()
@@ -57,7 +74,8 @@ class SharedStore:
         share_ids: List[str] = [],
     ) -> List[Tuple[PcsFile, PcsSharedLinkInfo]]:
         sql = " OR ".join([f"`{f}` like ?" for f in fields * len(keywords)])
-        query = PcsFileTable.select().join(
+        # Select the shared link infos with the files, or each one is fetched per row
+        query = PcsFileTable.select(PcsFileTable, PcsSharedLinkInfoTable).join(
             PcsSharedLinkInfoTable,
             on=(PcsFileTable.shared_link_info_id == PcsSharedLinkInfoTable.id),
         )
@@ -97,7 +115,8 @@ class SharedStore:
         limit: int = 100,
         offset: int = 0,
     ) -> List[Tuple[PcsFile, PcsSharedLinkInfo]]:
-        query = PcsFileTable.select().join(
+        # Select the shared link infos with the files, or each one is fetched per row
+        query = PcsFileTable.select(PcsFileTable, PcsSharedLinkInfoTable).join(
             PcsSharedLinkInfoTable,
             on=(PcsFileTable.shared_link_info_id == PcsSharedLinkInfoTable.id),
         )
@@ -166,7 +185,6 @@ class AliPCSApiMixWithSharedStore(AliPCSApiMix):
             return pcs_files, next_marker
 
         if share_id:
-            for pcs_file in pcs_files:
-                self._sharedstore.add_shared_file(share_id, pcs_file)
+            self._sharedstore.add_shared_files(share_id, pcs_files)
 
         return pcs_files, next_marker
@@ -1,42 +1,73 @@
 import typing
-from typing import Tuple, List, Dict, Any
+from typing import Tuple, List, Dict, Any, FrozenSet
 from peewee import (
     Model,
     CharField,
     IntegerField,
+    BigIntegerField,
     Database,
     SqliteDatabase,
     TextField,
     SmallIntegerField,
     ForeignKeyField,
+    BooleanField,
+    chunked,
 )
 from playhouse.migrate import SchemaMigrator, SqliteMigrator, migrate
 
 from alipcs_py.alipcs.inner import PcsFile, PcsSharedLinkInfo
 from alipcs_py.common.util import json_dump_values
 
+# The maximum number of host parameters in a single SQLite statement before 3.32
+SQLITE_MAX_VARIABLE_NUMBER = 999
+
+SQLITE_PRAGMAS = (
+    ("journal_mode", "wal"),
+    ("synchronous", "normal"),
+    ("temp_store", "memory"),
+    ("busy_timeout", 5000),
+)
+
+# The dataclass field types whose column values are converted back to bool
+_BOOL_TYPES = (bool, typing.Optional[bool])
+
 
 class Deserializer:
     @classmethod
     def pcs_item(cls) -> Any:
         raise NotImplementedError()
 
+    @classmethod
+    def _field_plan(cls) -> Tuple[Tuple[str, ...], FrozenSet[str]]:
+        """The columns which are fields of the pcs item, and the bool ones of them
+
+        It is computed once per table class.
+        """
+
+        plan = cls.__dict__.get("__pcs_plan__")
+        if plan is None:
+            columns = cls._meta.columns  # type: ignore
+            pcs_fields = cls.pcs_item().__dataclass_fields__
+            names = tuple(col for col in columns.keys() if col in pcs_fields)
+            # `BooleanField` columns are converted by peewee
+            bool_names = frozenset(
+                name
+                for name in names
+                if pcs_fields[name].type in _BOOL_TYPES and not isinstance(columns[name], BooleanField)
+            )
+            plan = (names, bool_names)
+            cls.__pcs_plan__ = plan  # type: ignore
+        return plan
+
     def to_pcs(self) -> PcsSharedLinkInfo:
-        pcs_item = self.pcs_item()
+        names, bool_names = self._field_plan()
         data: Dict[str, Any] = {}
-        columns = self.__class__._meta.columns  # type: ignore
-        pcs_fields = pcs_item.__dataclass_fields__
-        for col in columns.keys():
-            if col in pcs_fields:
-                val = getattr(self, col)
-                if pcs_fields[col].type == typing.Optional[bool] or pcs_fields[col].type == bool:
-                    if val is None:
-                        data[col] = None
-                    else:
-                        data[col] = bool(val)
-                else:
-                    data[col] = val
-        return pcs_item(**data)
+        for col in names:
+            val = getattr(self, col)
+            if val is not None and col in bool_names:
+                val = bool(val)
+            data[col] = val
+        return self.pcs_item()(**data)
 
 
 class PcsSharedLinkInfoTable(Deserializer, Model):
@@ -46,8 +77,8 @@ class PcsSharedLinkInfoTable(Deserializer, Model):
     display_name = CharField(null=True)
     file_count = IntegerField(null=True)
     file_infos = TextField(null=True)  # json
-    expiration = IntegerField(null=True)
-    updated_at = IntegerField(null=True)
+    expiration = BigIntegerField(null=True)
+    updated_at = BigIntegerField(null=True)
     vip = CharField(null=True)
     avatar = CharField(null=True)
     is_following_creator = SmallIntegerField(null=True)
@@ -58,7 +89,7 @@ class PcsSharedLinkInfoTable(Deserializer, Model):
     class Meta:
         indexes = (
             # create a non-unique
-            (("share_id",), False),
+            # `share_id` is indexed by its unique constraint
             (("share_name",), False),
             (("display_name",), False),
         )
@@ -78,13 +109,13 @@ class PcsFileTable(Deserializer, Model):
     name = CharField(null=False)
     parent_file_id = CharField(null=False)
     type = CharField(null=False)
-    is_dir = SmallIntegerField(null=False)
-    is_file = SmallIntegerField(null=False)
-    size = IntegerField(null=True)
+    is_dir = BooleanField(null=False)
+    is_file = BooleanField(null=False)
+    size = BigIntegerField(null=True)
     path = CharField(null=True)
 
-    created_at = IntegerField(null=True)
-    updated_at = IntegerField(null=True)
+    created_at = BigIntegerField(null=True)
+    updated_at = BigIntegerField(null=True)
 
     file_extension = CharField(null=True)
     content_type = CharField(null=True)
@@ -93,8 +124,8 @@ class PcsFileTable(Deserializer, Model):
     labels = CharField(null=True)
 
     status = CharField(null=True)
-    hidden = IntegerField(null=True)
-    starred = IntegerField(null=True)
+    hidden = BooleanField(null=True)
+    starred = BooleanField(null=True)
     category = CharField(null=True)
     punish_flag = IntegerField(null=True)
     encrypt_mode = CharField(null=True)
@@ -112,10 +143,8 @@ class PcsFileTable(Deserializer, Model):
     class Meta:
         indexes = (
             # create a non-unique
-            (("file_id",), False),
+            # `file_id` is indexed by its unique constraint
             (("name",), False),
-            (("is_dir",), False),
-            (("is_file",), False),
             (("path",), False),
             (("file_extension",), False),
         )
@@ -125,13 +154,26 @@ class PcsFileTable(Deserializer, Model):
         kwargs = json_dump_values(kwargs)
         return super().get_or_create(**kwargs)
 
+    @classmethod
+    def insert_rows(cls, rows: List[Dict[str, Any]]):
+        """Insert the rows with multi-row INSERTs, ignoring the existed files"""
+
+        if not rows:
+            return
+
+        rows = [json_dump_values(row) for row in rows]
+        batch_size = max(1, SQLITE_MAX_VARIABLE_NUMBER // len(rows[0]))
+        with cls._meta.database.atomic():  # type: ignore
+            for batch in chunked(rows, batch_size):
+                cls.insert_many(batch).on_conflict_ignore().execute()
+
     @classmethod
     def pcs_item(cls) -> Any:
         return PcsFile
 
 
 def connect_sqlite(path: str) -> Tuple[Database, SchemaMigrator]:
-    db = SqliteDatabase(path)
+    db = SqliteDatabase(path, pragmas=SQLITE_PRAGMAS)
     return db, SqliteMigrator(db)
 
 
@@ -139,39 +181,48 @@ def bind_tables(tables: List[type], db: Database):
     db.bind(tables)
 
 
-def create_tables(tables: List[type], db: Database):
-    db.create_tables(tables)
+# Indexes which are no longer declared but exist in old databases
+_OBSOLETE_INDEXES = ("pcsfiletable_is_dir", "pcsfiletable_is_file")
 
 
-def get_db_field(tp: type):
-    if tp == str:
-        return CharField(null=True)
-    elif tp == typing.Optional[str]:
-        return CharField(null=True)
+def create_tables(tables: List[type], db: Database):
+    with db.atomic():
+        db.create_tables(tables)
+
+        for index in _OBSOLETE_INDEXES:
+            db.execute_sql(f'DROP INDEX IF EXISTS "{index}"')
 
-    elif tp == typing.List[str]:
-        return TextField(null=True)
 
-    elif tp == int:
-        return IntegerField(null=True)
-    elif tp == typing.Optional[int]:
-        return IntegerField(null=True)
+_DB_FIELD_TYPES: Dict[Any, type] = {
+    str: CharField,
+    typing.Optional[str]: CharField,
+    typing.List[str]: TextField,
+    int: IntegerField,
+    typing.Optional[int]: IntegerField,
+    bool: BooleanField,
+    typing.Optional[bool]: BooleanField,
+}
 
-    elif tp == bool:
-        return IntegerField(null=True)
-    elif tp == typing.Optional[int]:
-        return IntegerField(null=True)
 
-    else:
-        raise ValueError("Unsupported type: %s", tp)
+def get_db_field(tp: type):
+    field_type = _DB_FIELD_TYPES.get(tp)
+    if field_type is None:
+        raise ValueError(f"Unsupported type: {tp}")
+    return field_type(null=True)
 
 
 def modify_table(table: Any, db: Database, migrator: SchemaMigrator):
     table_name = table._meta.name  # type: ignore
     pcs_fields = table.pcs_item().__dataclass_fields__
-    columns = set([c.name for c in db.get_columns(table_name)])
+    columns = {c.name for c in db.get_columns(table_name)}
 
+    operations = []
     for name, field in pcs_fields.items():
         if name not in columns:
             db_field = get_db_field(field.type)
-            migrate(migrator.add_column(table_name, name, db_field))
+            operations.append(migrator.add_column(table_name, name, db_field))
+
+    if operations:
+        with db.atomic():
+            migrate(*operations)
+        db.execute_sql(f'ANALYZE "{table_name}"')
@@ -1,11 +1,18 @@
+from typing import Tuple, List, Iterator, Callable
 import os
+import random
+import time
+import uuid
+import shutil
+import tarfile
 from pathlib import Path
 
 from alipcs_py import AliPCS, AliPCSApi
+from alipcs_py.alipcs.inner import PcsFile
 from alipcs_py.commands.upload import upload, from_tos
-from alipcs_py.common.platform import IS_WIN
+from alipcs_py.common.crypto import calc_sha1
 
-from tests.datas import REFRESH_TOKEN, Datas
+from tests.datas import REFRESH_TOKEN, Datas, UploadFile
 
 import pytest
 
@@ -15,27 +22,36 @@ LOCAL_DIR = Path("tests", "test-datas", "demo-directory")
 TEST_DATA_PATH = LOCAL_DIR.parent / "demo-directory.tar.gz"
 
 
+def pytest_configure(config):
+    config.addinivalue_line("markers", "remote: the test calls the AliPCS api")
+
+
+def pytest_collection_modifyitems(config, items):
+    # The tests using the api are marked as remote and need a refresh token,
+    # `-m "not remote"` runs the offline tests only
+    skip = pytest.mark.skip(reason="No REFRESH_TOKEN")
+    for item in items:
+        if "alipcsapi" in item.fixturenames:
+            item.add_marker(pytest.mark.remote)
+            if not REFRESH_TOKEN:
+                item.add_marker(skip)
+
+
 @pytest.fixture(scope="session")
 def uncompress_test_data():
-    if LOCAL_DIR.exists():
-        if IS_WIN:
-            os.system(f"rd /s /q {LOCAL_DIR}")
-        else:
-            os.system(f"rm -rf {LOCAL_DIR}")
+    shutil.rmtree(LOCAL_DIR, ignore_errors=True)
 
     assert TEST_DATA_PATH.exists()
-    if IS_WIN:
-        os.system(f"tar -xf {TEST_DATA_PATH} -C tests\\test-datas")
-    else:
-        os.system(f"tar -xf {TEST_DATA_PATH} -C tests/test-datas")
+    with tarfile.open(TEST_DATA_PATH) as tar:
+        # The extraction filter is only in the Pythons with PEP 706
+        if hasattr(tarfile, "data_filter"):
+            tar.extractall(LOCAL_DIR.parent, filter="data")
+        else:
+            tar.extractall(LOCAL_DIR.parent)
 
     yield
 
-    if LOCAL_DIR.exists():
-        if IS_WIN:
-            os.system(f"rd /s /q {LOCAL_DIR}")
-        else:
-            os.system(f"rm -rf {LOCAL_DIR}")
+    shutil.rmtree(LOCAL_DIR, ignore_errors=True)
 
 
 @pytest.fixture(scope="session")
@@ -54,26 +70,106 @@ def datas(alipcsapi: AliPCSApi):
         return
 
     local_paths = []
+    local_relpaths = set()
+    from_paths = []
     local_dir = LOCAL_DIR
-    for root, _, files in os.walk(local_dir):
+    for root, dirs, files in os.walk(local_dir):
+        if root == str(local_dir):
+            # The top entries are uploaded
+            from_paths = [os.path.join(root, name) for name in sorted(dirs + files)]
         for fl in files:
-            local_paths.append(str(Path(root, fl)))
+            local_paths.append(os.path.join(root, fl))
+        for name in dirs + files:
+            local_relpaths.add(Path(root, name).relative_to(local_dir).as_posix())
 
     remote_dir = TEST_ROOT + "/-------"
     remote_dir_pcs_file = alipcsapi.makedir_path(remote_dir)[0]
-    from_paths = [str(local_dir / fn) for fn in os.listdir(local_dir)]
     from_to_list = from_tos(from_paths, remote_dir)
 
     upload(alipcsapi, from_to_list)
+    remote_paths = [to_ for _, to_ in from_to_list]
 
     yield Datas(
         local_dir=str(local_dir),
         local_paths=local_paths,
+        local_relpaths=frozenset(local_relpaths),
         remote_dir=remote_dir,
         remote_dir_pcs_file=remote_dir_pcs_file,
-        remote_paths=[to_ for _, to_ in from_to_list],
+        remote_paths=remote_paths,
+        remote_paths_set=frozenset(remote_paths),
     )
 
     pf = alipcsapi.meta_by_path(TEST_ROOT)
     assert pf is not None
     alipcsapi.remove(pf.file_id)
+
+
+@pytest.fixture
+def remote_ns(alipcsapi: AliPCSApi) -> Iterator[str]:
+    """A unique remote directory path for one test, removed after the test
+
+    The tests changing the remote files work under their own paths, so they do not
+    race on the same paths when they run concurrently.
+    """
+
+    ns = TEST_ROOT + "-" + uuid.uuid4().hex[:8]
+    yield ns
+
+    pf = alipcsapi.meta_by_path(ns)
+    if pf is not None:
+        alipcsapi.remove(pf.file_id)
+
+
+@pytest.fixture(scope="session")
+def remove_at_end(alipcsapi: AliPCSApi) -> Iterator[Callable[[str], None]]:
+    """Collect the file ids of the remote files which are created by the tests
+
+    The collected files are removed in one batch at the end of the session.
+    """
+
+    file_ids: List[str] = []
+    yield file_ids.append
+
+    if file_ids:
+        alipcsapi.remove(*file_ids)
+
+
+@pytest.fixture(scope="session")
+def remote_file(alipcsapi: AliPCSApi, datas: Datas) -> Tuple[str, PcsFile]:
+    """A random uploaded file and its remote path, resolved once"""
+
+    remote_path = random.choice(datas.remote_paths)
+    pcs_file = alipcsapi.meta_by_path(remote_path)
+    assert pcs_file is not None
+    return remote_path, pcs_file
+
+
+@pytest.fixture(scope="session")
+def indexed_name(alipcsapi: AliPCSApi, datas: Datas) -> str:
+    """The name of a random uploaded file, after the file can be searched"""
+
+    name = os.path.basename(random.choice(datas.remote_paths))
+
+    # Wait for the file to be indexed
+    for delay in (1, 2, 4, 8):
+        time.sleep(delay)
+        if any(pcs_file.name == name for pcs_file in alipcsapi.search(name)[0]):
+            break
+    return name
+
+
+@pytest.fixture(scope="session")
+def upload_file(tmp_path_factory) -> UploadFile:
+    """A random 10MB local file for the upload tests"""
+
+    content = os.urandom(1024 * 1024 * 10)
+    path = tmp_path_factory.mktemp("upload") / "test_upload_cmd"
+    path.write_bytes(content)
+    return UploadFile(path=path, size=len(content), sha1=calc_sha1(content), slice1k_sha1=calc_sha1(content[:1024]))
+
+
+@pytest.fixture(scope="session")
+def walked_files(alipcsapi: AliPCSApi, datas: Datas) -> List[PcsFile]:
+    """All the files and directories under the remote test directory"""
+
+    return list(alipcsapi.walk(datas.remote_dir_pcs_file.file_id))
@@ -1,16 +1,27 @@
 import os
 from dataclasses import dataclass
-from typing import List
+from typing import List, FrozenSet
+from pathlib import Path
 
 from alipcs_py.alipcs.inner import PcsFile
 
 REFRESH_TOKEN = os.getenv("REFRESH_TOKEN", "")
 
 
-@dataclass
+@dataclass(frozen=True)
 class Datas:
     local_dir: str
     local_paths: List[str]
+    local_relpaths: FrozenSet[str]  # The posix paths of all files and directories relative to `local_dir`
     remote_dir: str
     remote_dir_pcs_file: PcsFile
     remote_paths: List[str]
+    remote_paths_set: FrozenSet[str]
+
+
+@dataclass(frozen=True)
+class UploadFile:
+    path: Path
+    size: int
+    sha1: str
+    slice1k_sha1: str
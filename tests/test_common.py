@@ -1,18 +1,25 @@
 import time
 import os
 import io
-import subprocess
+import hashlib
+import zlib
+import base64
 
 import requests
 
 from alipcs_py.common import constant
 from alipcs_py.common.number import u64_to_u8x8, u8x8_to_u64
+from alipcs_py.common.concurrent import retry
+from alipcs_py.common.date import iso_8601_to_timestamp, timestamp_to_iso_8601
 from alipcs_py.common.path import join_path
-from alipcs_py.common.platform import IS_WIN
+from alipcs_py.common.net import make_http_session
+from alipcs_py.common.progress_bar import _progress, ProgressUpdater, remove_progress_task
+from alipcs_py.common.log import get_logger
 from alipcs_py.common.io import (
     PADDED_ENCRYPT_HEAD_WITH_SALT_LEN,
     total_len,
     ChunkIO,
+    HashedChunkIO,
     generate_nonce_or_iv,
     RangeRequestIO,
     SimpleEncryptIO,
@@ -26,8 +33,10 @@ from alipcs_py.common.crypto import (
     padding_key,
     padding_size,
     random_bytes,
-    _md5_cmd,
     calc_file_md5,
+    calc_crc32_and_md5,
+    calc_proof_code,
+    calc_sha1_with_prefix,
     SimpleCryptography,
     ChaCha20Cryptography,
     AES256CBCCryptography,
@@ -97,25 +106,44 @@ def test_rangerequestio():
     assert b == o
 
 
-def test_calu_file_md5():
-    # Github action fail on windows
-    if IS_WIN:
-        return
+def test_calu_file_md5(tmp_path):
+    path = tmp_path / "temp-file"
+    buf = os.urandom(constant.OneM * 2 + 14)
+    path.write_bytes(buf)
 
-    path = "temp-file"
-    fd = open(path, "w")
-    fd.write("asdf")
+    assert calc_file_md5(str(path)) == hashlib.md5(buf).hexdigest()
 
-    cp = subprocess.run(_md5_cmd(path), universal_newlines=True, stdout=subprocess.PIPE)
-    output = cp.stdout.strip()
-    print("calc_file_md5: cmd output:", output)
 
-    try:
-        r = calc_file_md5(path)
-        print("calc_file_md5:", r)
-    finally:
-        os.remove(path)
-    assert r
+def test_calc_crc32_and_md5(tmp_path):
+    buf = os.urandom(constant.OneM * 2 + 14)
+    expected = (zlib.crc32(buf), hashlib.md5(buf).hexdigest())
+
+    path = tmp_path / "temp-file"
+    path.write_bytes(buf)
+    with path.open("rb") as fd:
+        assert calc_crc32_and_md5(fd, constant.OneM) == expected
+
+    assert calc_crc32_and_md5(ChunkIO(io.BytesIO(buf), len(buf)), constant.OneM) == expected
+
+
+def test_calc_proof_code():
+    key = "access-token"
+    buf = os.urandom(1024)
+    bio = io.BytesIO(buf)
+
+    offset = int(hashlib.md5(key.encode("utf-8")).hexdigest()[:16], 16) % len(buf)
+    proof_code = calc_proof_code(bio, len(buf), key)
+    assert proof_code == base64.b64encode(buf[offset : offset + 8]).decode("utf-8")
+    assert bio.tell() == 0
+
+    assert calc_proof_code(io.BytesIO(b""), 0, key) == ""
+
+
+def test_calc_sha1_with_prefix():
+    buf = os.urandom(constant.OneM * 2 + 14)
+    bio = io.BytesIO(buf)
+    prefix = bio.read(1024)
+    assert calc_sha1_with_prefix(bio, prefix) == hashlib.sha1(buf).hexdigest()
 
 
 def test_simplecryptography():
@@ -126,6 +154,10 @@ def test_simplecryptography():
     dec = c.decrypt(enc)
     assert buf == dec
 
+    # Same as the byte map of the cython implementation
+    assert enc == c._c.encrypt(buf)
+    assert dec == c._c.decrypt(enc)
+
 
 def test_chacha20cryptography():
     key = os.urandom(32)
@@ -381,6 +413,21 @@ def test_chunkio():
     assert b.tell() == 2
 
 
+def test_hashedchunkio():
+    f = io.BytesIO(b"0123456789")
+    hasher = hashlib.sha1()
+    b = HashedChunkIO(f, 6, hasher)
+
+    # Read again after seeking back, as an upload retry does
+    assert b.read(4) == b"0123"
+    b.seek(0)
+    assert b.read(2) == b"01"
+    assert b.read() == b"2345"
+    b.seek(0)
+    assert b.read() == b"012345"
+    assert hasher.hexdigest() == hashlib.sha1(b"012345").hexdigest()
+
+
 def test_u64_u8x8():
     i = 2**32
     b = u64_to_u8x8(i)
@@ -393,6 +440,9 @@ def test_random_bytes():
     b2 = random_bytes(32, "abc")
     assert b1 == b2
 
+    # The output for a seed must never change, otherwise encrypted files can not be decrypted
+    assert random_bytes(16, b"abc") == b"\xeb\xb5R\x88\x1cn'\x07\x01\xa0\x8b>\xc7\xca\xbc\xdf"
+
 
 def test_padding_size():
     i = 13
@@ -427,3 +477,84 @@ def test_human_size():
     s_int = human_size_to_int(s_str)
 
     assert s == s_int
+
+
+def test_retry():
+    calls = []
+
+    @retry(2)
+    def fail():
+        calls.append(1)
+        raise ValueError("fail")
+
+    for _ in range(2):
+        try:
+            fail()
+        except ValueError:
+            pass
+    assert len(calls) == 4
+
+    fails = []
+
+    @retry(-1, except_callback=lambda err, fail_count: fails.append(fail_count))
+    def succeed_at_third():
+        if len(fails) < 2:
+            raise ValueError("fail")
+        return "ok"
+
+    assert succeed_at_third() == "ok"
+    assert fails == [1, 2]
+
+
+def test_iso_8601_to_timestamp():
+    assert iso_8601_to_timestamp("2021-06-22T07:16:03Z") == 1624346163
+    assert iso_8601_to_timestamp("2021-06-22T07:16:03.032Z") == 1624346163
+    assert iso_8601_to_timestamp("2021-06-22T07:16:03.0321Z") == 1624346163
+    assert iso_8601_to_timestamp("2021-06-22T15:16:03.5+08:00") == 1624346163
+    assert iso_8601_to_timestamp(timestamp_to_iso_8601(1624346163)) == 1624346163
+
+
+def test_make_http_session():
+    session = make_http_session(max_connections=20)
+    other = make_http_session(max_connections=20)
+    assert other is not session
+    assert other.get_adapter("https://") is session.get_adapter("https://")
+    assert other.cookies is not session.cookies
+    session.cookies.set("token", "1")
+    assert "token" not in other.cookies
+    assert make_http_session(max_connections=30).get_adapter("https://") is not session.get_adapter("https://")
+
+    adapter = make_http_session(max_retries=0, pool_block=True).get_adapter("https://")
+    assert adapter.max_retries.total == 0
+
+
+def test_progress_updater():
+    task_id = _progress.add_task("test", title="test", total=100)
+    updater = ProgressUpdater(task_id, total=100, step=50)
+
+    def completed():
+        return next(task.completed for task in _progress.tasks if task.id == task_id)
+
+    try:
+        updater(10)
+        assert completed() == 0
+
+        # Reaching the total is always shown
+        updater(100)
+        assert completed() == 100
+    finally:
+        remove_progress_task(task_id)
+
+
+def test_get_logger(tmp_path):
+    filename = tmp_path / "log" / "test.log"
+    logger = get_logger("test_get_logger", filename=filename)
+    assert get_logger("test_get_logger", filename=filename) is logger
+    assert len(logger.handlers) == 2
+
+    get_logger("test_get_logger", filename=tmp_path / "other.log")
+    assert len(logger.handlers) == 3
+
+    for handler in logger.handlers[:]:
+        handler.close()
+        logger.removeHandler(handler)